@@ -1,41 +1,135 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, BeforeValidator, PlainSerializer
+from typing import Annotated, List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+import time
+import hashlib
+import hmac
+import base64
+import functools
+from datetime import datetime, timezone
 import jwt
-from passlib.context import CryptContext
+import orjson
+from cachetools import TTLCache
+import bcrypt
 from bson import ObjectId
 
+# Read by motor at import time; never go below motor's cpu_count() * 5 default.
+os.environ.setdefault("MOTOR_MAX_WORKERS", str(max(16, (os.cpu_count() or 1) * 5)))
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=100,
+    minPoolSize=10,
+    waitQueueTimeoutMS=2500,
+    serverSelectionTimeoutMS=3000,
+    tz_aware=True,
+)
 db = client[os.environ['DB_NAME']]
+# Only the admin user listing reads from secondaries; orders need read-your-writes.
+admin_db = client.get_database(os.environ['DB_NAME'], read_preference=ReadPreference.SECONDARY_PREFERRED)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-security = HTTPBearer()
+JWT_TTL_SECONDS = 7 * 24 * 3600
+BCRYPT_ROUNDS = 10
+security = HTTPBearer(auto_error=False)
+
+_jwt_cache = TTLCache(maxsize=10000, ttl=30)
+
+_read_cache = TTLCache(maxsize=512, ttl=60)
+_read_cache_generation = 0
+
+PRODUCT_LIST_PROJECTION = {"_id": 0, "id": 1, "name": 1, "price": 1, "image": 1, "featured": 1, "category": 1}
+USER_LIST_PROJECTION = {"_id": 0, "id": 1, "email": 1, "name": 1, "role": 1, "created_at": 1}
+
+# Lookups must pass the same collation as the users.email index to use it.
+EMAIL_COLLATION = {"locale": "en", "strength": 2}
+
+def cached_read(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if key in _read_cache:
+            return _read_cache[key]
+        generation = _read_cache_generation
+        result = await func(*args, **kwargs)
+        # Skip the store if a write invalidated the cache during the await.
+        if generation == _read_cache_generation:
+            _read_cache[key] = result
+        return result
+    return wrapper
+
+def invalidate_read_cache():
+    global _read_cache_generation
+    _read_cache_generation += 1
+    _read_cache.clear()
+
+def _to_timestamp(value) -> Optional[int]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    return None
+
+def _timestamp_to_iso(value: Optional[int]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+Timestamp = Annotated[
+    Optional[int],
+    BeforeValidator(_to_timestamp),
+    PlainSerializer(_timestamp_to_iso, return_type=Optional[str], when_used="json"),
+]
+
+def iso_timestamps(doc: dict, *fields: str) -> dict:
+    for field in fields:
+        if field in doc:
+            doc[field] = _timestamp_to_iso(_to_timestamp(doc[field]))
+    return doc
+
+async def stream_json_array(cursor, *timestamp_fields: str):
+    yield b"["
+    first = True
+    async for doc in cursor:
+        chunk = orjson.dumps(iso_timestamps(doc, *timestamp_fields))
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
 
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     email: EmailStr
     name: str
     role: str = "user"
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: int(time.time()))
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -48,7 +142,7 @@ class UserLogin(BaseModel):
 
 class Product(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     name: str
     description: str
     price: float
@@ -56,7 +150,7 @@ class Product(BaseModel):
     image: str
     stock: int = 100
     featured: bool = False
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: int(time.time()))
 
 class ProductCreate(BaseModel):
     name: str
@@ -69,7 +163,7 @@ class ProductCreate(BaseModel):
 
 class Category(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     name: str
     slug: str
     image: str
@@ -89,7 +183,7 @@ class Cart(BaseModel):
     model_config = ConfigDict(extra="ignore")
     user_id: str
     items: List[CartItem]
-    updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    updated_at: Timestamp = Field(default_factory=lambda: int(time.time()))
 
 class OrderItem(BaseModel):
     product_id: str
@@ -99,14 +193,14 @@ class OrderItem(BaseModel):
 
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     user_id: str
     items: List[OrderItem]
     total: float
     address: dict
     payment_method: str
     status: str = "pending"
-    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    created_at: Timestamp = Field(default_factory=lambda: int(time.time()))
 
 class OrderCreate(BaseModel):
     items: List[OrderItem]
@@ -119,25 +213,47 @@ class SiteSettings(BaseModel):
     theme_colors: dict = {"primary": "#FACC15", "background": "#09090b"}
     payment_methods: dict = {"upi": True, "card": True, "cod": True}
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+
+async def hash_password(password: str) -> str:
+    return await asyncio.to_thread(_hash_password, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.to_thread(_verify_password, plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+_JWT_DIGEST = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}[JWT_ALGORITHM]
+_JWT_HEADER_B64 = _b64url(orjson.dumps({"alg": JWT_ALGORITHM, "typ": "JWT"}))
+_JWT_KEY = JWT_SECRET.encode()
 
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
         "user_id": user_id,
         "email": email,
         "role": role,
-        "exp": datetime.now(timezone.utc) + timedelta(days=7)
+        "exp": int(time.time()) + JWT_TTL_SECONDS
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    signing_input = _JWT_HEADER_B64 + b"." + _b64url(orjson.dumps(payload))
+    signature = hmac.new(_JWT_KEY, signing_input, _JWT_DIGEST).digest()
+    return (signing_input + b"." + _b64url(signature)).decode()
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Missing token")
+    token = credentials.credentials
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _jwt_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time() + 1:
+        return payload
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        _jwt_cache[key] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -151,30 +267,29 @@ async def get_admin_user(current_user: dict = Depends(get_current_user)):
 
 @api_router.post("/auth/signup")
 async def signup(user_data: UserCreate):
-    existing = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
     user = User(
-        email=user_data.email,
+        email=user_data.email.lower(),
         name=user_data.name,
         role="user"
     )
     doc = user.model_dump()
-    doc["password_hash"] = hash_password(user_data.password)
+    doc["password_hash"] = await hash_password(user_data.password)
     
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     token = create_token(user.id, user.email, user.role)
     
     return {"token": token, "user": user}
 
 @api_router.post("/auth/login")
 async def login(login_data: UserLogin):
-    user_doc = await db.users.find_one({"email": login_data.email}, {"_id": 0})
+    user_doc = await db.users.find_one({"email": login_data.email}, {"_id": 0}, collation=EMAIL_COLLATION)
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(login_data.password, user_doc["password_hash"]):
+    if not await verify_password(login_data.password, user_doc["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     user = User(**user_doc)
@@ -189,23 +304,29 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="User not found")
     return User(**user_doc)
 
-@api_router.get("/products", response_model=List[Product])
+@api_router.get("/products")
+@cached_read
 async def get_products(category: Optional[str] = None, search: Optional[str] = None):
     query = {}
     if category:
         query["category"] = category
     if search:
-        query["name"] = {"$regex": search, "$options": "i"}
+        query["$text"] = {"$search": search}
     
-    products = await db.products.find(query, {"_id": 0}).to_list(1000)
+    cursor = db.products.find(query, PRODUCT_LIST_PROJECTION)
+    if search:
+        cursor = cursor.sort([("score", {"$meta": "textScore"})])
+    products = await cursor.to_list(1000)
     return products
 
-@api_router.get("/products/featured", response_model=List[Product])
+@api_router.get("/products/featured")
+@cached_read
 async def get_featured_products():
-    products = await db.products.find({"featured": True}, {"_id": 0}).to_list(20)
+    products = await db.products.find({"featured": True}, PRODUCT_LIST_PROJECTION).to_list(20)
     return products
 
 @api_router.get("/products/{product_id}", response_model=Product)
+@cached_read
 async def get_product(product_id: str):
     product = await db.products.find_one({"id": product_id}, {"_id": 0})
     if not product:
@@ -216,6 +337,7 @@ async def get_product(product_id: str):
 async def create_product(product_data: ProductCreate, admin: dict = Depends(get_admin_user)):
     product = Product(**product_data.model_dump())
     await db.products.insert_one(product.model_dump())
+    invalidate_read_cache()
     return product
 
 @api_router.put("/products/{product_id}", response_model=Product)
@@ -226,6 +348,7 @@ async def update_product(product_id: str, product_data: ProductCreate, admin: di
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    invalidate_read_cache()
     
     updated = await db.products.find_one({"id": product_id}, {"_id": 0})
     return Product(**updated)
@@ -235,9 +358,11 @@ async def delete_product(product_id: str, admin: dict = Depends(get_admin_user))
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    invalidate_read_cache()
     return {"message": "Product deleted"}
 
-@api_router.get("/categories", response_model=List[Category])
+@api_router.get("/categories")
+@cached_read
 async def get_categories():
     categories = await db.categories.find({}, {"_id": 0}).to_list(100)
     return categories
@@ -246,6 +371,7 @@ async def get_categories():
 async def create_category(category_data: CategoryCreate, admin: dict = Depends(get_admin_user)):
     category = Category(**category_data.model_dump())
     await db.categories.insert_one(category.model_dump())
+    invalidate_read_cache()
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -256,6 +382,7 @@ async def update_category(category_id: str, category_data: CategoryCreate, admin
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    invalidate_read_cache()
     
     updated = await db.categories.find_one({"id": category_id}, {"_id": 0})
     return Category(**updated)
@@ -265,6 +392,7 @@ async def delete_category(category_id: str, admin: dict = Depends(get_admin_user
     result = await db.categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    invalidate_read_cache()
     return {"message": "Category deleted"}
 
 @api_router.get("/cart")
@@ -272,7 +400,7 @@ async def get_cart(current_user: dict = Depends(get_current_user)):
     cart = await db.carts.find_one({"user_id": current_user["user_id"]}, {"_id": 0})
     if not cart:
         return {"user_id": current_user["user_id"], "items": []}
-    return cart
+    return iso_timestamps(cart, "updated_at")
 
 @api_router.post("/cart")
 async def update_cart(cart_data: Cart, current_user: dict = Depends(get_current_user)):
@@ -283,6 +411,50 @@ async def update_cart(cart_data: Cart, current_user: dict = Depends(get_current_
     )
     return cart_data
 
+@api_router.post("/cart/items")
+async def upsert_cart_item(item: CartItem, current_user: dict = Depends(get_current_user)):
+    if item.quantity <= 0:
+        return await remove_cart_item(item.product_id, current_user)
+    user_id = current_user["user_id"]
+    updated_at = int(time.time())
+    set_quantity = {
+        "filter": {"user_id": user_id, "items.product_id": item.product_id},
+        "update": {"$set": {"items.$[i].quantity": item.quantity, "updated_at": updated_at}},
+        "array_filters": [{"i.product_id": item.product_id}],
+        "projection": {"_id": 0},
+        "return_document": ReturnDocument.AFTER,
+    }
+    cart = await db.carts.find_one_and_update(**set_quantity)
+    if cart:
+        return iso_timestamps(cart, "updated_at")
+    
+    try:
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id, "items.product_id": {"$ne": item.product_id}},
+            {"$push": {"items": item.model_dump()}, "$set": {"updated_at": updated_at}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent request added the same product first; update it instead.
+        cart = await db.carts.find_one_and_update(**set_quantity)
+    if not cart:
+        return {"user_id": user_id, "items": []}
+    return iso_timestamps(cart, "updated_at")
+
+@api_router.delete("/cart/items/{product_id}")
+async def remove_cart_item(product_id: str, current_user: dict = Depends(get_current_user)):
+    cart = await db.carts.find_one_and_update(
+        {"user_id": current_user["user_id"]},
+        {"$pull": {"items": {"product_id": product_id}}, "$set": {"updated_at": int(time.time())}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not cart:
+        return {"user_id": current_user["user_id"], "items": []}
+    return iso_timestamps(cart, "updated_at")
+
 @api_router.post("/orders", response_model=Order)
 async def create_order(order_data: OrderCreate, current_user: dict = Depends(get_current_user)):
     order = Order(
@@ -295,15 +467,15 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(get
     
     return order
 
-@api_router.get("/orders", response_model=List[Order])
+@api_router.get("/orders")
 async def get_orders(current_user: dict = Depends(get_current_user)):
     orders = await db.orders.find({"user_id": current_user["user_id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return orders
+    return [iso_timestamps(order, "created_at") for order in orders]
 
-@api_router.get("/admin/orders", response_model=List[Order])
+@api_router.get("/admin/orders")
 async def get_all_orders(admin: dict = Depends(get_admin_user)):
-    orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return orders
+    cursor = db.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(1000).batch_size(200)
+    return StreamingResponse(stream_json_array(cursor, "created_at"), media_type="application/json")
 
 @api_router.put("/admin/orders/{order_id}")
 async def update_order_status(order_id: str, status: str, admin: dict = Depends(get_admin_user)):
@@ -315,86 +487,115 @@ async def update_order_status(order_id: str, status: str, admin: dict = Depends(
         raise HTTPException(status_code=404, detail="Order not found")
     return {"message": "Order updated"}
 
-@api_router.get("/admin/users", response_model=List[User])
+@api_router.get("/admin/users")
 async def get_all_users(admin: dict = Depends(get_admin_user)):
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return users
+    cursor = admin_db.users.find({}, USER_LIST_PROJECTION).limit(1000).batch_size(200)
+    return StreamingResponse(stream_json_array(cursor, "created_at"), media_type="application/json")
+
+SETTINGS_TTL_SECONDS = 60
+_settings_cache: Optional[tuple] = None  # (settings, loaded_at)
 
 @api_router.get("/settings")
 async def get_settings():
+    global _settings_cache
+    if _settings_cache is not None and time.monotonic() - _settings_cache[1] < SETTINGS_TTL_SECONDS:
+        return _settings_cache[0]
     settings = await db.site_settings.find_one({}, {"_id": 0})
     if not settings:
-        default_settings = SiteSettings()
-        await db.site_settings.insert_one(default_settings.model_dump())
-        return default_settings
+        settings = SiteSettings().model_dump()
+        await db.site_settings.insert_one(dict(settings))
+    _settings_cache = (settings, time.monotonic())
     return settings
 
 @api_router.put("/admin/settings")
 async def update_settings(settings: SiteSettings, admin: dict = Depends(get_admin_user)):
+    global _settings_cache
     await db.site_settings.update_one(
         {},
         {"$set": settings.model_dump()},
         upsert=True
     )
+    _settings_cache = (settings.model_dump(), time.monotonic())
     return settings
 
+def _seed_id(kind: str, key: str) -> str:
+    return uuid.uuid5(uuid.NAMESPACE_DNS, f"{kind}:{key}").hex
+
+_SEED_CATEGORIES = (
+    {"id": _seed_id("category", "electronics"), "name": "Electronics", "slug": "electronics", "image": "https://images.unsplash.com/photo-1605170876472-db58e15c430e?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Latest gadgets and tech"},
+    {"id": _seed_id("category", "accessories"), "name": "Accessories", "slug": "accessories", "image": "https://images.unsplash.com/photo-1673997303871-178507ca875a?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Fashion accessories"},
+    {"id": _seed_id("category", "kitchen"), "name": "Kitchen", "slug": "kitchen", "image": "https://images.unsplash.com/photo-1556911220-bff31c812dba?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Kitchen essentials"},
+    {"id": _seed_id("category", "furniture"), "name": "Furniture", "slug": "furniture", "image": "https://images.unsplash.com/photo-1723804685588-b8e95b2044f3?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Modern furniture"},
+    {"id": _seed_id("category", "fashion"), "name": "Fashion", "slug": "fashion", "image": "https://images.unsplash.com/photo-1542755687-a33ff0c970ec?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Trendy clothing"},
+    {"id": _seed_id("category", "others"), "name": "Others", "slug": "others", "image": "https://images.unsplash.com/photo-1550989460-0adf9ea622e2?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Miscellaneous items"}
+)
+
+_SEED_PRODUCTS = (
+    {"id": _seed_id("product", "Wireless Headphones"), "name": "Wireless Headphones", "description": "Premium noise-canceling headphones", "price": 199.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=500", "stock": 50, "featured": True},
+    {"id": _seed_id("product", "Smart Watch"), "name": "Smart Watch", "description": "Fitness tracking smartwatch", "price": 299.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=500", "stock": 30, "featured": True},
+    {"id": _seed_id("product", "Laptop Stand"), "name": "Laptop Stand", "description": "Ergonomic aluminum laptop stand", "price": 49.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527864550417-7fd91fc51a46?w=500", "stock": 100, "featured": False},
+    {"id": _seed_id("product", "Mechanical Keyboard"), "name": "Mechanical Keyboard", "description": "RGB gaming keyboard", "price": 129.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1587829741301-dc798b83add3?w=500", "stock": 45, "featured": True},
+    {"id": _seed_id("product", "Wireless Mouse"), "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 39.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527814050087-3793815479db?w=500", "stock": 80, "featured": False},
+    {"id": _seed_id("product", "Leather Wallet"), "name": "Leather Wallet", "description": "Genuine leather bifold wallet", "price": 59.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1627123424574-724758594e93?w=500", "stock": 60, "featured": True},
+    {"id": _seed_id("product", "Sunglasses"), "name": "Sunglasses", "description": "Classic aviator sunglasses", "price": 89.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1572635196237-14b3f281503f?w=500", "stock": 70, "featured": False},
+    {"id": _seed_id("product", "Backpack"), "name": "Backpack", "description": "Durable travel backpack", "price": 79.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=500", "stock": 40, "featured": True},
+    {"id": _seed_id("product", "Coffee Maker"), "name": "Coffee Maker", "description": "Automatic drip coffee maker", "price": 149.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1517668808822-9ebb02f2a0e6?w=500", "stock": 25, "featured": False},
+    {"id": _seed_id("product", "Blender"), "name": "Blender", "description": "High-speed professional blender", "price": 99.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1585515320310-259814833e62?w=500", "stock": 35, "featured": True},
+    {"id": _seed_id("product", "Knife Set"), "name": "Knife Set", "description": "Professional chef knife set", "price": 159.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1593618998160-e34014e67546?w=500", "stock": 20, "featured": False},
+    {"id": _seed_id("product", "Office Chair"), "name": "Office Chair", "description": "Ergonomic mesh office chair", "price": 349.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1580480055273-228ff5388ef8?w=500", "stock": 15, "featured": True},
+    {"id": _seed_id("product", "Standing Desk"), "name": "Standing Desk", "description": "Adjustable height standing desk", "price": 499.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1595515106969-1ce29566ff1c?w=500", "stock": 10, "featured": True},
+    {"id": _seed_id("product", "Bookshelf"), "name": "Bookshelf", "description": "Modern 5-tier bookshelf", "price": 199.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1594620302200-9a762244a156?w=500", "stock": 18, "featured": False},
+    {"id": _seed_id("product", "T-Shirt"), "name": "T-Shirt", "description": "Cotton casual t-shirt", "price": 29.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=500", "stock": 100, "featured": False},
+    {"id": _seed_id("product", "Jeans"), "name": "Jeans", "description": "Classic slim fit jeans", "price": 79.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1542272604-787c3835535d?w=500", "stock": 90, "featured": True},
+    {"id": _seed_id("product", "Sneakers"), "name": "Sneakers", "description": "Comfortable running sneakers", "price": 119.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1460353581641-37baddab0fa2?w=500", "stock": 50, "featured": True},
+    {"id": _seed_id("product", "Hoodie"), "name": "Hoodie", "description": "Warm pullover hoodie", "price": 69.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500", "stock": 65, "featured": False},
+    {"id": _seed_id("product", "Phone Case"), "name": "Phone Case", "description": "Protective silicone phone case", "price": 19.99, "category": "others", "image": "https://images.unsplash.com/photo-1601784551446-20c9e07cdbdb?w=500", "stock": 150, "featured": False},
+    {"id": _seed_id("product", "Water Bottle"), "name": "Water Bottle", "description": "Insulated stainless steel bottle", "price": 34.99, "category": "others", "image": "https://images.unsplash.com/photo-1602143407151-7111542de6e8?w=500", "stock": 120, "featured": False},
+    {"id": _seed_id("product", "Yoga Mat"), "name": "Yoga Mat", "description": "Non-slip exercise yoga mat", "price": 44.99, "category": "others", "image": "https://images.unsplash.com/photo-1601925260368-ae2f83cf8b7f?w=500", "stock": 75, "featured": True},
+    {"id": _seed_id("product", "Desk Lamp"), "name": "Desk Lamp", "description": "LED adjustable desk lamp", "price": 54.99, "category": "others", "image": "https://images.unsplash.com/photo-1507473885765-e6ed057f782c?w=500", "stock": 55, "featured": False},
+    {"id": _seed_id("product", "Power Bank"), "name": "Power Bank", "description": "20000mAh portable charger", "price": 49.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1609091839311-d5365f9ff1c5?w=500", "stock": 85, "featured": False},
+    {"id": _seed_id("product", "USB-C Cable"), "name": "USB-C Cable", "description": "Fast charging USB-C cable", "price": 14.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1625948515291-69613efd103f?w=500", "stock": 200, "featured": False},
+    {"id": _seed_id("product", "Webcam"), "name": "Webcam", "description": "1080p HD streaming webcam", "price": 89.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1588508065123-287b28e013da?w=500", "stock": 40, "featured": True},
+    {"id": _seed_id("product", "Microphone"), "name": "Microphone", "description": "USB condenser microphone", "price": 129.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1590602847861-f357a9332bbc?w=500", "stock": 30, "featured": False},
+    {"id": _seed_id("product", "Monitor"), "name": "Monitor", "description": "27-inch 4K monitor", "price": 399.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527443224154-c4a3942d3acf?w=500", "stock": 20, "featured": True},
+    {"id": _seed_id("product", "Tablet"), "name": "Tablet", "description": "10-inch Android tablet", "price": 299.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1561154464-82e9adf32764?w=500", "stock": 25, "featured": True},
+    {"id": _seed_id("product", "Gaming Mouse Pad"), "name": "Gaming Mouse Pad", "description": "Extended RGB mouse pad", "price": 29.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1615663245857-ac93bb7c39e7?w=500", "stock": 95, "featured": False},
+    {"id": _seed_id("product", "Speaker System"), "name": "Speaker System", "description": "2.1 desktop speaker system", "price": 149.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1608043152269-423dbba4e7e1?w=500", "stock": 35, "featured": False}
+)
+
 @api_router.post("/init-data")
 async def initialize_data():
-    existing_admin = await db.users.find_one({"email": "admin@shop.com"})
+    existing_admin, existing_categories, existing_products = await asyncio.gather(
+        db.users.find_one({"email": "admin@shop.com"}, {"_id": 1}, collation=EMAIL_COLLATION),
+        db.categories.estimated_document_count(),
+        db.products.estimated_document_count(),
+    )
+    
+    # Probe first so repeat calls skip the bcrypt hash.
     if not existing_admin:
         admin = User(email="admin@shop.com", name="Admin", role="admin")
         admin_doc = admin.model_dump()
-        admin_doc["password_hash"] = hash_password("admin123")
-        await db.users.insert_one(admin_doc)
+        admin_doc["password_hash"] = await hash_password("admin123")
+        await db.users.update_one(
+            {"email": admin_doc["email"]},
+            {"$setOnInsert": admin_doc},
+            upsert=True,
+            collation=EMAIL_COLLATION
+        )
     
-    existing_categories = await db.categories.count_documents({})
     if existing_categories == 0:
-        categories = [
-            {"id": str(uuid.uuid4()), "name": "Electronics", "slug": "electronics", "image": "https://images.unsplash.com/photo-1605170876472-db58e15c430e?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Latest gadgets and tech"},
-            {"id": str(uuid.uuid4()), "name": "Accessories", "slug": "accessories", "image": "https://images.unsplash.com/photo-1673997303871-178507ca875a?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Fashion accessories"},
-            {"id": str(uuid.uuid4()), "name": "Kitchen", "slug": "kitchen", "image": "https://images.unsplash.com/photo-1556911220-bff31c812dba?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Kitchen essentials"},
-            {"id": str(uuid.uuid4()), "name": "Furniture", "slug": "furniture", "image": "https://images.unsplash.com/photo-1723804685588-b8e95b2044f3?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Modern furniture"},
-            {"id": str(uuid.uuid4()), "name": "Fashion", "slug": "fashion", "image": "https://images.unsplash.com/photo-1542755687-a33ff0c970ec?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Trendy clothing"},
-            {"id": str(uuid.uuid4()), "name": "Others", "slug": "others", "image": "https://images.unsplash.com/photo-1550989460-0adf9ea622e2?crop=entropy&cs=srgb&fm=jpg&q=85", "description": "Miscellaneous items"}
-        ]
-        await db.categories.insert_many(categories)
+        await db.categories.bulk_write(
+            [UpdateOne({"id": c["id"]}, {"$setOnInsert": c}, upsert=True) for c in _SEED_CATEGORIES],
+            ordered=False
+        )
     
-    existing_products = await db.products.count_documents({})
     if existing_products == 0:
-        products = [
-            {"id": str(uuid.uuid4()), "name": "Wireless Headphones", "description": "Premium noise-canceling headphones", "price": 199.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=500", "stock": 50, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Smart Watch", "description": "Fitness tracking smartwatch", "price": 299.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=500", "stock": 30, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Laptop Stand", "description": "Ergonomic aluminum laptop stand", "price": 49.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527864550417-7fd91fc51a46?w=500", "stock": 100, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Mechanical Keyboard", "description": "RGB gaming keyboard", "price": 129.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1587829741301-dc798b83add3?w=500", "stock": 45, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Wireless Mouse", "description": "Ergonomic wireless mouse", "price": 39.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527814050087-3793815479db?w=500", "stock": 80, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Leather Wallet", "description": "Genuine leather bifold wallet", "price": 59.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1627123424574-724758594e93?w=500", "stock": 60, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Sunglasses", "description": "Classic aviator sunglasses", "price": 89.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1572635196237-14b3f281503f?w=500", "stock": 70, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Backpack", "description": "Durable travel backpack", "price": 79.99, "category": "accessories", "image": "https://images.unsplash.com/photo-1553062407-98eeb64c6a62?w=500", "stock": 40, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Coffee Maker", "description": "Automatic drip coffee maker", "price": 149.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1517668808822-9ebb02f2a0e6?w=500", "stock": 25, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Blender", "description": "High-speed professional blender", "price": 99.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1585515320310-259814833e62?w=500", "stock": 35, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Knife Set", "description": "Professional chef knife set", "price": 159.99, "category": "kitchen", "image": "https://images.unsplash.com/photo-1593618998160-e34014e67546?w=500", "stock": 20, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Office Chair", "description": "Ergonomic mesh office chair", "price": 349.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1580480055273-228ff5388ef8?w=500", "stock": 15, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Standing Desk", "description": "Adjustable height standing desk", "price": 499.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1595515106969-1ce29566ff1c?w=500", "stock": 10, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Bookshelf", "description": "Modern 5-tier bookshelf", "price": 199.99, "category": "furniture", "image": "https://images.unsplash.com/photo-1594620302200-9a762244a156?w=500", "stock": 18, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "T-Shirt", "description": "Cotton casual t-shirt", "price": 29.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=500", "stock": 100, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Jeans", "description": "Classic slim fit jeans", "price": 79.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1542272604-787c3835535d?w=500", "stock": 90, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Sneakers", "description": "Comfortable running sneakers", "price": 119.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1460353581641-37baddab0fa2?w=500", "stock": 50, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Hoodie", "description": "Warm pullover hoodie", "price": 69.99, "category": "fashion", "image": "https://images.unsplash.com/photo-1556821840-3a63f95609a7?w=500", "stock": 65, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Phone Case", "description": "Protective silicone phone case", "price": 19.99, "category": "others", "image": "https://images.unsplash.com/photo-1601784551446-20c9e07cdbdb?w=500", "stock": 150, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Water Bottle", "description": "Insulated stainless steel bottle", "price": 34.99, "category": "others", "image": "https://images.unsplash.com/photo-1602143407151-7111542de6e8?w=500", "stock": 120, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Yoga Mat", "description": "Non-slip exercise yoga mat", "price": 44.99, "category": "others", "image": "https://images.unsplash.com/photo-1601925260368-ae2f83cf8b7f?w=500", "stock": 75, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Desk Lamp", "description": "LED adjustable desk lamp", "price": 54.99, "category": "others", "image": "https://images.unsplash.com/photo-1507473885765-e6ed057f782c?w=500", "stock": 55, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Power Bank", "description": "20000mAh portable charger", "price": 49.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1609091839311-d5365f9ff1c5?w=500", "stock": 85, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "USB-C Cable", "description": "Fast charging USB-C cable", "price": 14.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1625948515291-69613efd103f?w=500", "stock": 200, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Webcam", "description": "1080p HD streaming webcam", "price": 89.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1588508065123-287b28e013da?w=500", "stock": 40, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Microphone", "description": "USB condenser microphone", "price": 129.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1590602847861-f357a9332bbc?w=500", "stock": 30, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Monitor", "description": "27-inch 4K monitor", "price": 399.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1527443224154-c4a3942d3acf?w=500", "stock": 20, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Tablet", "description": "10-inch Android tablet", "price": 299.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1561154464-82e9adf32764?w=500", "stock": 25, "featured": True},
-            {"id": str(uuid.uuid4()), "name": "Gaming Mouse Pad", "description": "Extended RGB mouse pad", "price": 29.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1615663245857-ac93bb7c39e7?w=500", "stock": 95, "featured": False},
-            {"id": str(uuid.uuid4()), "name": "Speaker System", "description": "2.1 desktop speaker system", "price": 149.99, "category": "electronics", "image": "https://images.unsplash.com/photo-1608043152269-423dbba4e7e1?w=500", "stock": 35, "featured": False}
-        ]
-        await db.products.insert_many(products)
+        await db.products.bulk_write(
+            [UpdateOne({"id": p["id"]}, {"$setOnInsert": p}, upsert=True) for p in _SEED_PRODUCTS],
+            ordered=False
+        )
     
+    invalidate_read_cache()
     return {"message": "Data initialized"}
 
 app.include_router(api_router)
@@ -413,6 +614,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+TIMESTAMP_MIGRATION_ID = "timestamps_to_int"
+
+async def _migrate_timestamp_field(collection, field: str):
+    requests = []
+    skipped = 0
+    async for doc in collection.find({field: {"$type": ["string", "date"]}}, {field: 1}):
+        timestamp = _to_timestamp(doc[field])
+        if timestamp is None:
+            skipped += 1
+            continue
+        requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: timestamp}}))
+        if len(requests) == 500:
+            await collection.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+    if skipped:
+        logger.warning("Left %d unparseable %s.%s values unmigrated", skipped, collection.name, field)
+
+async def migrate_timestamps():
+    # BSON sorts numbers below strings and dates, so legacy values must become ints.
+    if await db.migrations.find_one({"_id": TIMESTAMP_MIGRATION_ID}):
+        return
+    await asyncio.gather(
+        _migrate_timestamp_field(db.users, "created_at"),
+        _migrate_timestamp_field(db.products, "created_at"),
+        _migrate_timestamp_field(db.orders, "created_at"),
+        _migrate_timestamp_field(db.carts, "updated_at"),
+    )
+    await db.migrations.update_one(
+        {"_id": TIMESTAMP_MIGRATION_ID},
+        {"$set": {"applied_at": int(time.time())}},
+        upsert=True
+    )
+
+@app.on_event("startup")
+async def create_indexes():
+    await migrate_timestamps()
+    try:
+        await db.users.create_index("email", unique=True, collation=EMAIL_COLLATION)
+    except DuplicateKeyError:
+        duplicates = await db.users.aggregate([
+            {"$group": {"_id": {"$toLower": "$email"}, "emails": {"$push": "$email"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]).to_list(None)
+        logger.error(
+            "users.email index not created: these accounts differ only by case "
+            "and must be merged before duplicate signups are rejected: %s",
+            [d["emails"] for d in duplicates]
+        )
+    await db.users.create_index("id", unique=True)
+    await db.products.create_index("id", unique=True)
+    await db.products.create_index("category")
+    await db.products.create_index("featured")
+    await db.products.create_index([("name", "text"), ("description", "text")])
+    await db.carts.create_index("user_id", unique=True)
+    await db.orders.create_index([("user_id", 1), ("created_at", -1)])
+    await db.categories.create_index("id", unique=True)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file